@@ -6,13 +6,13 @@
 # - List recent jobs
 # - Template discovery and information
 
-import asyncio
 from pathlib import Path
 from typing import List
 
 from fastapi import APIRouter, Body, HTTPException, Request
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from loguru import logger
+from pydantic import TypeAdapter
 
 from app.config import settings
 from app.schema import (JobStatusResponse, JobSubmitResponse, LabelRequest,
@@ -21,6 +21,10 @@ from app.schema import (JobStatusResponse, JobSubmitResponse, LabelRequest,
 # Create router - all APIs will be mounted under /labels
 router = APIRouter(prefix="/labels", tags=["Labels"])
 
+# Job status routes serialize with pydantic's JSON encoder and return the bytes
+# directly; response_model stays on the routes for the OpenAPI docs only
+_JOB_LIST_ADAPTER = TypeAdapter(List[JobStatusResponse])
+
 
 # Submit Print Job
 @router.post(
@@ -236,7 +240,8 @@ async def get_job_status(job_id: str, request: Request):
     job = job_manager.get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    return JobStatusResponse(job_id=job_id, **job)
+    response = JobStatusResponse(job_id=job_id, **job)
+    return Response(content=response.model_dump_json(), media_type="application/json")
 
 
 # Stream Job Status (SSE)
@@ -298,8 +303,9 @@ async def stream_job_status(job_id: str, request: Request):
 
     ## Polling Interval
 
-    Status is checked every **1 second** and pushed only when status changes
-    or until a terminal state is reached.
+    The final status is pushed as soon as the job finishes; other changes
+    (e.g. `pending` → `running`) are checked every **1 second**. Updates are
+    pushed only when status changes, until a terminal state is reached.
 
     > **Tip**: Use this instead of polling `/jobs/{job_id}` for real-time updates
     """
@@ -335,7 +341,8 @@ async def stream_job_status(job_id: str, request: Request):
             if current_status in ("done", "failed"):
                 break
 
-            await asyncio.sleep(1)
+            # Wake as soon as the job finishes; re-check at least every second
+            await job_manager.wait_job(job_id, timeout=1)
 
     return StreamingResponse(
         event_generator(),
@@ -485,7 +492,8 @@ async def list_jobs(request: Request, limit: int = 10):
     """
     job_manager = request.app.state.job_manager
     jobs = job_manager.list_jobs(limit=limit)
-    return [JobStatusResponse(**j) for j in jobs]
+    content = _JOB_LIST_ADAPTER.dump_json([JobStatusResponse(**j) for j in jobs])
+    return Response(content=content, media_type="application/json")
 
 
 # List Available Templates
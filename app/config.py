@@ -29,6 +29,10 @@ class Settings(BaseSettings):
     #  >0   = explicit number of concurrent jobs (e.g. 4)
     #  0    = auto (defaults to CPU count - 1)
 
+    MAX_QUEUE_SIZE: int = 256
+    # Maximum jobs waiting in the queue; submissions wait while it is full
+    # Set to 0 for an unbounded queue
+
     GLABELS_TIMEOUT: int = 600
     # Max timeout per job in seconds (default 600 = 10 minutes)
 
@@ -43,6 +47,10 @@ class Settings(BaseSettings):
     RETENTION_HOURS: int = 24
     # Hours to keep job states in memory before cleanup (avoids memory bloat)
 
+    MAX_JOBS_IN_MEMORY: int = 10000
+    # Maximum job records kept in memory; oldest finished jobs are evicted first
+    # Set to 0 to disable (only RETENTION_HOURS applies)
+
     LOG_LEVEL: str = "INFO"
     # Logging level: DEBUG / INFO / WARNING / ERROR
     # Default INFO, recommended INFO or higher in production
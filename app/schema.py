@@ -29,8 +29,9 @@ class LabelRequest(BaseModel):
         1, ge=1, description="Number of copies per record (maps to glabels --copies)"
     )
 
-    # Pydantic v2: provide general example
+    # Pydantic v2: drop unknown fields, provide general example
     model_config = ConfigDict(
+        extra="ignore",
         json_schema_extra={
             "example": {
                 "template_name": "demo.glabels",
@@ -40,7 +41,7 @@ class LabelRequest(BaseModel):
                 ],
                 "copies": 2,
             }
-        }
+        },
     )
 
     @field_validator("template_name")
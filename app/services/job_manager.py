@@ -5,11 +5,17 @@
 # - debug logs: worker start, job execution, cleanup
 
 import asyncio
+import heapq
 import os
+import time
 import uuid
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from loguru import logger
 
@@ -18,16 +24,83 @@ from app.schema import LabelRequest
 from app.services.label_print import LabelPrintService
 
 
+# --------------------------------------------------------
+# Job record
+# --------------------------------------------------------
+@dataclass(slots=True)
+class JobRecord:
+    """
+    In-memory job state. Slotted: no per-record __dict__, which adds up
+    with MAX_JOBS_IN_MEMORY records retained.
+    """
+
+    filename: str  # output filename (PDF)
+    template: str  # gLabels template
+    created_at: datetime
+    request: Dict[str, Any]  # request summary (see JobManager._make_job)
+    status: str = "pending"
+    error: Optional[str] = None
+    started_at: Optional[datetime] = None  # when worker starts processing
+    finished_at: Optional[datetime] = None  # when job completes or fails
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Shallow dict copy of the record (API-facing shape).
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+_JOB_FIELDS = frozenset(JobRecord.__slots__)
+
+
+class JobView(Mapping):
+    """
+    Read-only, zero-copy mapping view of a JobRecord (what get_job returns).
+    Reads go straight to the record; item assignment raises TypeError.
+    """
+
+    __slots__ = ("_job",)
+
+    def __init__(self, job: JobRecord):
+        self._job = job
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _JOB_FIELDS:
+            raise KeyError(key)
+        return getattr(self._job, key)
+
+    def __iter__(self):
+        return iter(JobRecord.__slots__)
+
+    def __len__(self) -> int:
+        return len(JobRecord.__slots__)
+
+
 class JobManager:
     def __init__(self):
-        # All job states (in-memory)
-        self.jobs: Dict[str, Dict[str, Any]] = {}
-        # Async queue for job scheduling
-        self.queue: asyncio.Queue = asyncio.Queue()
-        # Worker task list
+        # Logger bound once for the manager: each call reuses its options
+        # and tags records with extra["component"]
+        self._log = logger.bind(component="job_manager")
+        # All job states (in-memory; capped by MAX_JOBS_IN_MEMORY).
+        # Invariant: submit_job is the only writer, so insertion order is
+        # submission order (oldest first) and list_jobs relies on it
+        self.jobs: OrderedDict[str, JobRecord] = OrderedDict()
+        # Min-heap of (finished time.monotonic(), job_id) for finished jobs,
+        # used by cleanup; monotonic so wall-clock jumps don't affect expiry
+        self._expiry_heap: List[Tuple[float, str]] = []
+        # Per-job completion futures, resolved by the worker when a job ends
+        self._done: Dict[str, asyncio.Future] = {}
+        # Async queue for job scheduling (bounded: submit_job waits when full)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.MAX_QUEUE_SIZE)
+        # Worker task list (children of the supervisor's TaskGroup)
         self.workers: List[asyncio.Task] = []
-        # Scheduled cleanup task
-        self.cleanup_task: Optional[asyncio.Task] = None
+        # Supervisor task owning the worker TaskGroup
+        self.supervisor_task: Optional[asyncio.Task] = None
+        # Expiry timer, armed for the oldest finished job (loop.call_later)
+        self._expiry_handle: Optional[asyncio.TimerHandle] = None
+        self._expiry_due: float = 0.0  # time.monotonic() the timer fires at
+        # output/ sweep timer, re-armed every cleanup_interval seconds
+        self._sweep_handle: Optional[asyncio.TimerHandle] = None
 
         # Counter: total submitted jobs (lifetime, reset on restart)
         self.jobs_total: int = 0
@@ -47,27 +120,51 @@ class JobManager:
 
         # Job retention period (expired jobs will be removed)
         self.retention = timedelta(hours=settings.RETENTION_HOURS)
+        # Seconds between output/ sweeps for expired (and orphaned) PDFs
+        self.cleanup_interval: float = 3600
+        # Seconds the supervisor waits before restarting a crashed pool
+        self.restart_delay: float = 1
+
+    # --------------------------------------------------------
+    # Job retention period (cached in seconds for cleanup arithmetic)
+    # --------------------------------------------------------
+    @property
+    def retention(self) -> timedelta:
+        return self._retention
+
+    @retention.setter
+    def retention(self, value: timedelta):
+        self._retention = value
+        self._retention_s = value.total_seconds()
 
     # --------------------------------------------------------
     # Create job record
     # --------------------------------------------------------
     def _make_job(
-        self, req: LabelRequest, job_id: str, filename: str
-    ) -> Dict[str, Any]:
+        self,
+        req: LabelRequest,
+        job_id: str,
+        filename: str,
+        now: Optional[datetime] = None,
+    ) -> JobRecord:
         """
         Create initial job record (pending status).
         """
-        now = datetime.now(timezone.utc)
-        return {
-            "status": "pending",
-            "filename": filename,  # output filename (PDF)
-            "template": req.template_name,  # gLabels template
-            "error": None,
-            "created_at": now,
-            "started_at": None,  # when worker starts processing
-            "finished_at": None,  # when job completes or fails
-            "request": req.model_dump(),
-        }
+        if now is None:
+            now = datetime.now(timezone.utc)
+        return JobRecord(
+            filename=filename,
+            template=req.template_name,
+            created_at=now,
+            # Summary only, read straight off the model (no model_dump):
+            # label data travels through the queue, so it can be freed once
+            # the job finishes instead of after RETENTION_HOURS
+            request={
+                "template_name": req.template_name,
+                "copies": req.copies,
+                "rows": len(req.data),
+            },
+        )
 
     # --------------------------------------------------------
     # Worker loop
@@ -76,132 +173,305 @@ class JobManager:
         """
         Worker loop:
         - Dequeue job
-        - Call LabelPrintService.generate_pdf
-        - Update job state
+        - Process it (see _process_job)
+
+        The per-job body is guarded: a bug in a single job's bookkeeping
+        fails that job only, and the loop keeps running. Letting it escape
+        would crash the TaskGroup and cancel every sibling's in-flight job.
+
+        Each job gets its own glabels run. Jobs are not coalesced into one
+        invocation: a template places several labels per sheet, so one
+        job's rows do not map to whole pages of a merged PDF.
         """
-        logger.info(f"[JobManager] Worker-{wid} started (max={self.max_parallel})")
+        self._log.info(f"[JobManager] Worker-{wid} started (max={self.max_parallel})")
         try:
             while True:
                 job_id, req, filename = await self.queue.get()
-                job = self.jobs[job_id]
-                job["status"] = "running"
-                job["started_at"] = datetime.now(timezone.utc)
-
-                logger.debug(
-                    f"[Worker-{wid}] START job_id={job_id}, template={req.template_name}"
-                )
-
                 try:
-                    await self.service.generate_pdf(
-                        job_id=job_id,
-                        template_name=req.template_name,
-                        data=req.data,
-                        copies=req.copies,
-                        filename=filename,  # target output filename
-                    )
-                    job["status"] = "done"
-                    logger.info(
-                        f"[Worker-{wid}] job_id={job_id} completed -> {filename}"
+                    await self._process_job(wid, job_id, req, filename)
+                except Exception:
+                    self._log.exception(
+                        f"[Worker-{wid}] job_id={job_id} internal error"
                     )
-                except Exception as e:
-                    job["status"] = "failed"
-                    job["error"] = str(e)
-                    logger.exception(f"[Worker-{wid}] job_id={job_id} failed")
+                    self._abandon_job(job_id)
                 finally:
-                    job["finished_at"] = datetime.now(timezone.utc)
                     self.queue.task_done()
-                    self._cleanup_jobs()
         except asyncio.CancelledError:
-            logger.info(f"[Worker-{wid}] stopped by cancel()")
+            self._log.info(f"[Worker-{wid}] stopped by cancel()")
             raise
 
+    async def _process_job(
+        self, wid: int, job_id: str, req: LabelRequest, filename: str
+    ):
+        """
+        Run one job: call LabelPrintService.generate_pdf and update its state.
+        """
+        job = self.jobs[job_id]
+        job.status = "running"
+        job.started_at = datetime.now(timezone.utc)
+
+        self._log.debug(
+            f"[Worker-{wid}] START job_id={job_id}, template={req.template_name}"
+        )
+
+        try:
+            await self.service.generate_pdf(
+                job_id=job_id,
+                template_name=req.template_name,
+                data=req.data,
+                copies=req.copies,
+                filename=filename,  # target output filename
+            )
+            job.status = "done"
+            self._log.info(f"[Worker-{wid}] job_id={job_id} completed -> {filename}")
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            self._log.exception(f"[Worker-{wid}] job_id={job_id} failed")
+        finally:
+            if job.status == "running":
+                # Cancelled mid-job (shutdown or a pool restart)
+                job.status = "failed"
+                job.error = "worker cancelled"
+            job.finished_at = datetime.now(timezone.utc)
+            heapq.heappush(self._expiry_heap, (time.monotonic(), job_id))
+            self._schedule_expiry()
+            done = self._done.get(job_id)
+            if done is not None and not done.done():
+                done.set_result(None)
+
+    def _abandon_job(self, job_id: str):
+        """
+        Best-effort close-out of a job whose processing raised unexpectedly:
+        mark it failed, make it expire and wake anyone waiting on it.
+        """
+        job = self.jobs.get(job_id)
+        if job is not None:
+            if job.status not in ("done", "failed"):
+                job.status = "failed"
+                job.error = "internal error"
+            if job.finished_at is None:
+                job.finished_at = datetime.now(timezone.utc)
+                heapq.heappush(self._expiry_heap, (time.monotonic(), job_id))
+        done = self._done.get(job_id)
+        if done is not None and not done.done():
+            done.set_result(None)
+
     # --------------------------------------------------------
     # Cleanup expired jobs and PDFs
     # --------------------------------------------------------
     def _cleanup_jobs(self):
         """
         Cleanup expired job records and scan output/ to delete old PDFs.
-        Uses file modification time to handle orphaned files as well.
         """
-        cutoff = datetime.now(timezone.utc) - self.retention
+        self._expire_jobs()
+        self._sweep_output()
 
-        # 1. Cleanup expired job records from memory (only finished jobs)
-        old_jobs = [
-            jid
-            for jid, job in self.jobs.items()
-            if job.get("finished_at") is not None and job["finished_at"] < cutoff
-        ]
-        for jid in old_jobs:
-            logger.debug(f"[JobManager] cleanup expired job_id={jid}")
-            self.jobs.pop(jid, None)
+    def _expire_jobs(self):
+        """
+        Drop finished job records older than the retention window.
+        Only finished jobs are on the heap, so pop until the oldest
+        remaining one is inside the window. Entries whose job was already
+        evicted are skipped (lazy deletion). No filesystem access.
+        """
+        cutoff = time.monotonic() - self._retention_s
+        while self._expiry_heap and self._expiry_heap[0][0] <= cutoff:
+            _, jid = heapq.heappop(self._expiry_heap)
+            self._done.pop(jid, None)
+            if self.jobs.pop(jid, None) is not None:
+                self._log.debug(f"[JobManager] cleanup expired job_id={jid}")
 
-        # 2. Scan output/ to delete all expired PDFs (including orphaned files)
+    def _sweep_output(self):
+        """
+        Scan output/ to delete all expired PDFs (including orphaned files).
+        Uses file modification time, so it does not depend on job records.
+        """
         output_dir = Path("output")
         if not output_dir.exists():
             return
 
-        cutoff_timestamp = cutoff.timestamp()
+        cutoff_timestamp = time.time() - self._retention_s
         for pdf in output_dir.glob("*.pdf"):
             try:
                 if pdf.stat().st_mtime < cutoff_timestamp:
                     pdf.unlink()
-                    logger.debug(f"[JobManager] deleted old PDF: {pdf.name}")
+                    self._log.debug(f"[JobManager] deleted old PDF: {pdf.name}")
             except OSError as e:
-                logger.warning(f"[JobManager] cannot delete PDF {pdf.name}: {e}")
+                self._log.warning(f"[JobManager] cannot delete PDF {pdf.name}: {e}")
 
     # --------------------------------------------------------
-    # Scheduled cleanup (runs every hour)
+    # Enforce in-memory job cap
     # --------------------------------------------------------
-    async def _cleanup_scheduler(self):
+    def _evict_overflow(self):
         """
-        Background task that runs cleanup periodically.
-        Ensures expired jobs and PDFs are removed even when idle.
+        Drop the oldest finished jobs (and their PDFs) once the number of
+        records exceeds MAX_JOBS_IN_MEMORY. Pending/running jobs are kept.
         """
-        try:
-            while True:
-                await asyncio.sleep(3600)  # 1 hour
-                self._cleanup_jobs()
-                logger.debug("[JobManager] ⏰ Scheduled cleanup completed")
-        except asyncio.CancelledError:
-            logger.debug("[JobManager] ⏰ Cleanup scheduler stopped")
-            raise
+        overflow = len(self.jobs) - settings.MAX_JOBS_IN_MEMORY
+        if settings.MAX_JOBS_IN_MEMORY <= 0 or overflow <= 0:
+            return
+
+        evicted = []
+        for jid, job in self.jobs.items():
+            if job.finished_at is not None:
+                evicted.append(jid)
+                if len(evicted) >= overflow:
+                    break
+
+        for jid in evicted:
+            job = self.jobs.pop(jid)
+            self._done.pop(jid, None)
+            self._log.debug(f"[JobManager] evict job_id={jid} (MAX_JOBS_IN_MEMORY)")
+            pdf = Path("output") / job.filename
+            try:
+                pdf.unlink(missing_ok=True)
+            except OSError as e:
+                self._log.warning(f"[JobManager] cannot delete PDF {pdf.name}: {e}")
+
+        # Evicted jobs stay on the expiry heap (lazy deletion); compact it
+        # once stale entries dominate, so the cap also bounds the heap.
+        # Rebuilding at 2x keeps the cost amortised O(1) per eviction.
+        if len(self._expiry_heap) > 2 * len(self.jobs):
+            self._expiry_heap = [e for e in self._expiry_heap if e[1] in self.jobs]
+            heapq.heapify(self._expiry_heap)
+
+    # --------------------------------------------------------
+    # Scheduled cleanup (expiry timer + periodic output/ sweep)
+    # --------------------------------------------------------
+    def _schedule_expiry(self):
+        """
+        Arm the expiry timer for the oldest finished job. Keeps an already
+        armed timer that fires sooner; nothing is armed while no job is
+        finished, so the loop only wakes up when a record is due.
+        """
+        if not self._expiry_heap:
+            return
+        now = time.monotonic()
+        due = max(now, self._expiry_heap[0][0] + self._retention_s)
+
+        if self._expiry_handle is not None:
+            if self._expiry_due <= due:
+                return
+            self._expiry_handle.cancel()
+
+        self._expiry_due = due
+        self._expiry_handle = asyncio.get_running_loop().call_later(
+            due - now, self._run_expiry
+        )
+
+    def _run_expiry(self):
+        """
+        Timer callback: drop expired records, then re-arm for the next one.
+        """
+        self._expiry_handle = None
+        self._expire_jobs()
+        self._schedule_expiry()
+
+    def _schedule_sweep(self):
+        """
+        Arm the next output/ sweep, cleanup_interval seconds from now.
+        """
+        self._sweep_handle = asyncio.get_running_loop().call_later(
+            self.cleanup_interval, self._run_sweep
+        )
+
+    def _run_sweep(self):
+        """
+        Timer callback: sweep output/, then re-arm.
+        """
+        self._sweep_output()
+        self._log.debug("[JobManager] ⏰ Scheduled cleanup completed")
+        self._schedule_sweep()
 
     # --------------------------------------------------------
     # Worker pool management
     # --------------------------------------------------------
+    async def _run_pool(self):
+        """
+        Run one generation of the worker pool inside a TaskGroup.
+        An unexpected worker crash cancels the rest of the pool instead of
+        leaving it half-running.
+        """
+        async with asyncio.TaskGroup() as tg:
+            for wid in range(self.max_parallel):
+                worker = tg.create_task(self._worker(wid))
+                self.workers.append(worker)
+                if worker.done():
+                    break  # crashed while starting eagerly: the group aborts
+
+    async def _supervise_workers(self):
+        """
+        Keep the worker pool running: restart it after restart_delay when a
+        worker crashes. Cancelling this task cancels and awaits the pool.
+        Each generation gets its own task, so the TaskGroup's cancellation
+        of its parent on a crash never reaches the supervisor.
+
+        Per-job errors are contained in _worker; only a crash outside that
+        guard reaches here. The TaskGroup then cancels every sibling, so
+        their in-flight jobs end as failed ("worker cancelled") before the
+        pool restarts.
+        """
+        while True:
+            self.workers.clear()
+            pool = asyncio.create_task(self._run_pool())
+            try:
+                await asyncio.wait((pool,))
+            except asyncio.CancelledError:
+                pool.cancel()
+                await asyncio.gather(pool, return_exceptions=True)
+                raise
+
+            # Workers never return, so the pool only ends when one crashed
+            exc = None if pool.cancelled() else pool.exception()
+            self._log.opt(exception=exc).error(
+                f"[JobManager] worker pool crashed, restarting in "
+                f"{self.restart_delay}s"
+            )
+            await asyncio.sleep(self.restart_delay)
+
     def start_workers(self):
         """
-        Start all workers and scheduled cleanup task.
+        Start all workers and arm the cleanup timers.
         """
         # Run cleanup once at startup
         self._cleanup_jobs()
 
-        # Start worker pool
-        for wid in range(self.max_parallel):
-            task = asyncio.create_task(self._worker(wid))
-            self.workers.append(task)
+        # Eager tasks (Python 3.12+) run inline until their first real
+        # suspension, skipping a scheduler hop when queue data is ready
+        loop = asyncio.get_running_loop()
+        if hasattr(asyncio, "eager_task_factory") and loop.get_task_factory() is None:
+            loop.set_task_factory(asyncio.eager_task_factory)
 
-        # Start scheduled cleanup (hourly)
-        self.cleanup_task = asyncio.create_task(self._cleanup_scheduler())
+        # Start worker pool (workers are created by the supervisor)
+        self.supervisor_task = asyncio.create_task(self._supervise_workers())
 
-        logger.info(f"[JobManager] started with {self.max_parallel} workers")
+        # Arm scheduled cleanup
+        self._schedule_expiry()
+        self._schedule_sweep()
+
+        self._log.info(f"[JobManager] started with {self.max_parallel} workers")
 
     async def stop_workers(self):
         """
-        Stop all workers and cleanup scheduler.
+        Stop all workers and the cleanup timers.
         """
-        # Stop cleanup scheduler
-        if self.cleanup_task:
-            self.cleanup_task.cancel()
-            await asyncio.gather(self.cleanup_task, return_exceptions=True)
-            self.cleanup_task = None
-
-        # Stop all workers
-        for task in self.workers:
-            task.cancel()
-        await asyncio.gather(*self.workers, return_exceptions=True)
+        # Stop all workers: one cancel, the TaskGroup cancels and awaits them
+        if self.supervisor_task:
+            self.supervisor_task.cancel()
+            await asyncio.gather(self.supervisor_task, return_exceptions=True)
+            self.supervisor_task = None
         self.workers.clear()
-        logger.info("[JobManager] stopped")
+
+        # Stop cleanup timers (after the pool: a cancelled worker's finally
+        # block can still re-arm the expiry timer)
+        if self._expiry_handle is not None:
+            self._expiry_handle.cancel()
+            self._expiry_handle = None
+        if self._sweep_handle is not None:
+            self._sweep_handle.cancel()
+            self._sweep_handle = None
+            self._log.debug("[JobManager] ⏰ Cleanup scheduler stopped")
+        self._log.info("[JobManager] stopped")
 
     # --------------------------------------------------------
     # Public API methods
@@ -212,31 +482,64 @@ class JobManager:
         - Generate job_id
         - Create output filename
         - Create job record
-        - Enqueue for worker processing
+        - Enqueue for worker processing (waits while the queue is full)
         """
         job_id = str(uuid.uuid4())
-        filename = self.service.make_output_filename(req.template_name)
-        self.jobs[job_id] = self._make_job(req, job_id, filename)
+        now = datetime.now(timezone.utc)  # shared by record and filename
+        filename = self.service.make_output_filename(req.template_name, now=now)
+        job = self._make_job(req, job_id, filename, now=now)
+        self.jobs[job_id] = job
+        self._done[job_id] = asyncio.get_running_loop().create_future()
+        self._evict_overflow()
+
+        try:
+            await self.queue.put((job_id, req, filename))
+        except asyncio.CancelledError:
+            # Caller gave up while waiting for queue space: drop the record
+            self.jobs.pop(job_id, None)
+            self._done.pop(job_id, None)
+            raise
 
         # Increment total submitted jobs counter
         self.jobs_total += 1
 
-        await self.queue.put((job_id, req, filename))
-        logger.info(
+        self._log.info(
             f"[JobManager] submitted job_id={job_id}, template={req.template_name}"
         )
         return job_id
 
-    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+    async def wait_job(self, job_id: str, timeout: float) -> bool:
+        """
+        Wait up to `timeout` seconds for a job to reach done/failed.
+        Returns True if it is terminal (or no longer tracked), else False.
+        Without a pending future (a record injected without one, or a future
+        resolved outside the worker) it sleeps the full timeout, so callers
+        looping on it never spin.
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.status in ("done", "failed"):
+            return True
+
+        done = self._done.get(job_id)
+        if done is None or done.done():
+            await asyncio.sleep(timeout)
+        else:
+            await asyncio.wait((done,), timeout=timeout)
+
+        job = self.jobs.get(job_id)
+        return job is None or job.status in ("done", "failed")
+
+    def get_job(self, job_id: str) -> Optional[JobView]:
         """
-        Retrieve a single job by job_id.
+        Retrieve a single job by job_id (read-only view, no copy).
         """
-        return self.jobs.get(job_id)
+        job = self.jobs.get(job_id)
+        return JobView(job) if job is not None else None
 
     def list_jobs(self, limit: int = 10) -> List[Dict[str, Any]]:
         """
-        List the most recent N jobs.
+        List the most recent N jobs (newest first).
+        Walks the insertion-ordered store from the newest end: O(limit).
         """
-        items = list(self.jobs.items())
-        items.sort(key=lambda kv: kv[1]["created_at"], reverse=True)
-        return [dict(job_id=jid, **data) for jid, data in items[:limit]]
+        recent = islice(reversed(self.jobs.items()), max(limit, 0))
+        return [dict(job_id=jid, **job.to_dict()) for jid, job in recent]
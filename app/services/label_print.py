@@ -11,6 +11,7 @@ import asyncio
 import csv
 import os
 import re
+import string
 import time
 from datetime import datetime
 from pathlib import Path
@@ -23,12 +24,31 @@ from app.config import settings
 from app.utils.glabels_engine import GlabelsEngine, GlabelsRunError
 
 
+# str.translate table for _slug: keeps A-Z, a-z, 0-9, dot, underscore, hyphen
+class _SlugTable(dict):
+    def __missing__(self, codepoint: int) -> str:
+        # Any code point outside the ASCII table (e.g. non-ASCII letters)
+        return "_"
+
+
+_SLUG_ALLOWED = frozenset(string.ascii_letters + string.digits + "._-")
+_SLUG_TABLE = _SlugTable(
+    {c: (c if chr(c) in _SLUG_ALLOWED else "_") for c in range(128)}
+)
+
+
 # Utility functions
 def _collect_fieldnames(rows: List[Dict], exclude: Iterable[str] = ()) -> List[str]:
     """
     Collect field names from JSON rows in the order of appearance.
     Optionally exclude specific keys.
     """
+    # Fast path: uniform schema (every row has the first row's keys)
+    if rows:
+        first_keys = rows[0].keys()
+        if all(row.keys() == first_keys for row in rows):
+            return [k for k in first_keys if k not in exclude]
+
     seen = set()
     order: List[str] = []
     for row in rows:
@@ -46,7 +66,18 @@ def _slug(s: str) -> str:
     Convert string to a safe filename.
     Allowed characters: A-Z, a-z, 0-9, dot, underscore, hyphen.
     """
-    return re.sub(r"[^A-Za-z0-9._-]", "_", s or "")
+    return (s or "").translate(_SLUG_TABLE)
+
+
+# Characters that force csv.writer (QUOTE_MINIMAL) to quote a field
+_CSV_QUOTE_CHARS = re.compile(r'["\r\n]')
+
+
+def _csv_cell(value) -> str:
+    """
+    Convert a JSON value to its CSV text, matching csv.writer (None -> "").
+    """
+    return "" if value is None else str(value)
 
 
 def _chunk_list(data: List, chunk_size: int) -> List[List]:
@@ -82,6 +113,9 @@ class LabelPrintService:
             max_parallel = max(1, (os.cpu_count() or 2) - 1)
 
         self.keep_csv = keep_csv
+        # Case-insensitive template name -> path, rebuilt when templates/ changes
+        self._template_cache: Dict[str, Path] = {}
+        self._template_cache_mtime: Optional[int] = None
         self.engine = GlabelsEngine(
             max_parallel=max_parallel,
             default_timeout=default_timeout,
@@ -91,11 +125,12 @@ class LabelPrintService:
     # Generate output filename
     # --------------------------------------------------------
     @staticmethod
-    def make_output_filename(template_name: str) -> str:
+    def make_output_filename(template_name: str, now: Optional[datetime] = None) -> str:
         """
         Generate a safe output PDF filename based on template name + timestamp.
+        The timestamp uses local time; pass `now` to reuse an existing clock read.
         """
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        ts = (now.astimezone() if now else datetime.now()).strftime("%Y%m%d_%H%M%S")
         base = Path(template_name).stem
         return f"{_slug(base)}_{ts}.pdf"
 
@@ -117,11 +152,27 @@ class LabelPrintService:
         fieldnames = field_order or _collect_fieldnames(data)
         logger.debug(f"[LabelPrint] Writing CSV {csv_path}, fields={fieldnames}")
 
-        with csv_path.open("w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for row in data:
-                writer.writerow({k: row.get(k, "") for k in fieldnames})
+        rows = [fieldnames]
+        rows.extend([_csv_cell(row.get(k)) for k in fieldnames] for row in data)
+        lines = [",".join(cells) for cells in rows]
+
+        # Fast path: no field contains a comma, quote or newline (and no
+        # lone empty field), so csv.writer would not quote anything and the
+        # pre-joined lines are byte-identical to its output.
+        sep_count = len(fieldnames) - 1
+        needs_escape = any(
+            line.count(",") != sep_count
+            or _CSV_QUOTE_CHARS.search(line)
+            or (sep_count == 0 and not line)
+            for line in lines
+        )
+
+        if not needs_escape:
+            # Single encode + write; no per-row write calls
+            csv_path.write_bytes(("\r\n".join(lines) + "\r\n").encode("utf-8"))
+        else:
+            with csv_path.open("w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerows(rows)
 
         return fieldnames
 
@@ -131,14 +182,29 @@ class LabelPrintService:
     def _resolve_template(self, template_name: str) -> Path:
         """
         Verify template file exists inside the templates/ directory.
+        The directory listing is cached until its mtime changes; a lookup
+        miss always rescans once before raising.
         """
         if not template_name.lower().endswith(".glabels"):
             raise ValueError("Only .glabels templates are allowed")
 
-        lower_name = template_name.lower()
-        for f in Path("templates").iterdir():
-            if f.name.lower() == lower_name:
-                return f
+        templates_dir = Path("templates")
+        mtime = templates_dir.stat().st_mtime_ns
+        key = template_name.lower()
+        if mtime == self._template_cache_mtime:
+            template_path = self._template_cache.get(key)
+            if template_path is not None:
+                return template_path
+
+        # Stale listing or a miss: rescan. Misses rescan even when the mtime
+        # is unchanged, since coarse-timestamp filesystems and bind-mounted
+        # host shares may not bump it when a template is added
+        self._template_cache = {f.name.lower(): f for f in templates_dir.iterdir()}
+        self._template_cache_mtime = mtime
+
+        template_path = self._template_cache.get(key)
+        if template_path is not None:
+            return template_path
 
         raise FileNotFoundError(f"gLabels template not found: {template_name}")
 
@@ -170,8 +236,8 @@ class LabelPrintService:
             f"labels={len(data)}, csv={csv_path.name}, pdf={batch_pdf.name}"
         )
 
-        # JSON → CSV
-        self._json_to_csv(data, csv_path, field_order=field_order)
+        # JSON → CSV (off the event loop)
+        await asyncio.to_thread(self._json_to_csv, data, csv_path, field_order)
 
         try:
             await self.engine.run_batch(
@@ -240,7 +306,7 @@ class LabelPrintService:
         if not need_batch:
             # ============ Single batch processing (original logic) ============
             csv_path = temp_dir / f"{job_id}.csv"
-            self._json_to_csv(data, csv_path, field_order=field_order)
+            await asyncio.to_thread(self._json_to_csv, data, csv_path, field_order)
 
             logger.debug(
                 f"[LabelPrint] START job_id={job_id}, template={template_path}, "
@@ -330,7 +396,7 @@ class LabelPrintService:
             # Merge all batch PDFs
             logger.debug(f"[LabelPrint] Merging {num_batches} PDFs...")
             merge_start = time.time()
-            _merge_pdfs(batch_pdfs, output_pdf)
+            await asyncio.to_thread(_merge_pdfs, batch_pdfs, output_pdf)
             merge_duration = time.time() - merge_start
             logger.debug(f"[LabelPrint] Merge completed in {merge_duration:.2f}s")
 
@@ -102,10 +102,13 @@ class GlabelsEngine:
         """
         Wait for subprocess to finish, with optional timeout.
         If timeout occurs, the process will be killed and awaited to avoid zombies.
+        `asyncio.timeout` applies to the current task, so unlike `wait_for`
+        no extra Task is created per job.
         """
         try:
-            return await asyncio.wait_for(proc.communicate(), timeout=timeout)
-        except asyncio.TimeoutError:
+            async with asyncio.timeout(timeout):
+                return await proc.communicate()
+        except TimeoutError:
             with contextlib.suppress(ProcessLookupError):
                 proc.kill()
                 await proc.wait()
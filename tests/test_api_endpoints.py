@@ -6,6 +6,7 @@ Unit tests for API Endpoints
 Covers essential API functionality:
 - POST /labels/print (job submission validation)
 - GET /labels/templates (template listing)
+- GET /labels/jobs/{job_id} (job status)
 - GET /labels/jobs/{job_id}/stream (SSE streaming)
 - Basic error handling
 """
@@ -18,7 +19,7 @@ import pytest
 from fastapi.testclient import TestClient
 
 from app.main import app
-from app.services.job_manager import JobManager
+from app.services.job_manager import JobManager, JobRecord
 
 
 class FakeJobManager:
@@ -208,6 +209,33 @@ class TestAPIEndpoints:
         assert response.status_code == 200
         assert len(response.json()) == 2
 
+    def test_get_job_status(self, client_with_fake_manager):
+        """Should return the job status as JSON, or 404 for unknown jobs."""
+        jm = app.state.job_manager
+        now = datetime.now(timezone.utc)
+        jm.jobs["failed-job"] = {
+            "status": "failed",
+            "filename": "failed.pdf",
+            "template": "demo.glabels",
+            "error": "boom",
+            "created_at": now,
+            "started_at": now,
+            "finished_at": now,
+            "request": {"template_name": "demo.glabels", "data": [], "copies": 1},
+        }
+
+        response = client_with_fake_manager.get("/labels/jobs/failed-job")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        body = response.json()
+        assert body["job_id"] == "failed-job"
+        assert body["status"] == "failed"
+        assert body["error"] == "boom"
+        assert "request" not in body
+
+        response = client_with_fake_manager.get("/labels/jobs/missing-job")
+        assert response.status_code == 404
+
     def test_download_job_not_done(self, client_with_fake_manager):
         """Should return 409 when job is not done."""
         jm = app.state.job_manager
@@ -301,16 +329,17 @@ class TestSSEEndpoint:
         # Add a completed job to job_manager
         jm = app.state.job_manager
         job_id = "test-completed-job"
-        jm.jobs[job_id] = {
-            "status": "done",
-            "filename": "test.pdf",
-            "template": "demo.glabels",
-            "error": None,
-            "created_at": datetime.now(timezone.utc),
-            "started_at": datetime.now(timezone.utc),
-            "finished_at": datetime.now(timezone.utc),
-            "request": {"template_name": "demo.glabels", "data": [], "copies": 1},
-        }
+        now = datetime.now(timezone.utc)
+        jm.jobs[job_id] = JobRecord(
+            status="done",
+            filename="test.pdf",
+            template="demo.glabels",
+            error=None,
+            created_at=now,
+            started_at=now,
+            finished_at=now,
+            request={"template_name": "demo.glabels", "data": [], "copies": 1},
+        )
 
         # Stream should return event-stream content type
         response = client_with_state.get(f"/labels/jobs/{job_id}/stream")
@@ -329,16 +358,17 @@ class TestSSEEndpoint:
 
         jm = app.state.job_manager
         job_id = "test-failed-job"
-        jm.jobs[job_id] = {
-            "status": "failed",
-            "filename": "failed_job.pdf",  # filename is set even for failed jobs
-            "template": "demo.glabels",
-            "error": "Test error message",
-            "created_at": datetime.now(timezone.utc),
-            "started_at": datetime.now(timezone.utc),
-            "finished_at": datetime.now(timezone.utc),
-            "request": {"template_name": "demo.glabels", "data": [], "copies": 1},
-        }
+        now = datetime.now(timezone.utc)
+        jm.jobs[job_id] = JobRecord(
+            status="failed",
+            filename="failed_job.pdf",  # filename is set even for failed jobs
+            template="demo.glabels",
+            error="Test error message",
+            created_at=now,
+            started_at=now,
+            finished_at=now,
+            request={"template_name": "demo.glabels", "data": [], "copies": 1},
+        )
 
         response = client_with_state.get(f"/labels/jobs/{job_id}/stream")
 
@@ -5,30 +5,54 @@ Unit tests for JobManager
 
 Covers:
 - Submit job increments jobs_total and creates record
+- Submit job waits for space when the queue is full
 - Worker processes job and updates status to done
 - Worker failure updates status to failed with error
+- wait_job waits for a job to finish, with a timeout
 - Cleanup removes expired jobs
-- list_jobs returns most recent jobs, sorted by created_at
+- list_jobs returns most recent jobs, newest first
 - get_job returns correct job or None
 - jobs_total counter increases across multiple submissions
 - cleanup removes old PDFs from output directory
+- cleanup timer fires when the oldest finished job expires
+- expiring records does not rescan output/ per job
+- MAX_JOBS_IN_MEMORY evicts oldest finished jobs only
+- supervisor restarts the worker pool after a crash
 - start/stop workers manage worker tasks
 """
 
 import asyncio
+import heapq
+import time
 from datetime import datetime, timedelta, timezone
 
 import pytest
+import pytest_asyncio
 
 from app.schema import LabelRequest
-from app.services.job_manager import JobManager
+from app.services.job_manager import JobManager, JobRecord
 
 
-@pytest.mark.asyncio
-async def test_submit_and_complete_job(monkeypatch):
-    """Submitting a job should increment counter and complete with 'done' status"""
+@pytest.fixture(scope="module")
+def demo_req():
+    """One validated LabelRequest shared by the module (never mutated)"""
+    return LabelRequest(template_name="demo.glabels", data=[{"A": 1}], copies=1)
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def jm():
+    """One running JobManager shared by the module's submit/complete tests"""
+    manager = JobManager()
+    manager.start_workers()
+    yield manager
+    await manager.stop_workers()
 
-    jm = JobManager()
+
+@pytest.mark.asyncio(loop_scope="module")
+async def test_submit_and_complete_job(jm, demo_req, monkeypatch, tmp_path):
+    """Submitting a job should increment counter and complete with 'done' status"""
+    monkeypatch.chdir(tmp_path)  # cleanup below scans output/
+    before = jm.jobs_total
 
     # Mock generate_pdf to simulate success
     async def fake_generate_pdf(*a, **k):
@@ -36,53 +60,48 @@ async def test_submit_and_complete_job(monkeypatch):
 
     monkeypatch.setattr(jm.service, "generate_pdf", fake_generate_pdf)
 
-    jm.start_workers()
-
-    req = LabelRequest(template_name="demo.glabels", data=[{"A": 1}], copies=1)
-    job_id = await jm.submit_job(req)
+    job_id = await jm.submit_job(demo_req)
 
-    # Wait for queue to drain
-    await asyncio.wait_for(jm.queue.join(), timeout=1)
+    # Wait for the worker to resolve the job's completion future
+    await asyncio.wait_for(jm._done[job_id], timeout=1)
 
     job = jm.get_job(job_id)
     assert job["status"] == "done"
-    assert jm.jobs_total == 1
+    assert jm.jobs_total - before == 1
     assert "filename" in job
     assert job["template"] == "demo.glabels"
+    # Only a summary of the request is retained, not the label data
+    assert job["request"] == {"template_name": "demo.glabels", "copies": 1, "rows": 1}
 
-    await jm.stop_workers()
+    # Finished jobs are tracked for retention cleanup
+    monkeypatch.setattr(jm, "retention", timedelta(seconds=0))
+    jm._cleanup_jobs()
+    assert jm.get_job(job_id) is None
+    assert job_id not in jm._done
 
 
-@pytest.mark.asyncio
-async def test_submit_and_fail_job(monkeypatch):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_submit_and_fail_job(jm, demo_req, monkeypatch):
     """If generate_pdf raises, job should be marked failed with error"""
 
-    jm = JobManager()
-
     async def fake_generate_pdf(*a, **k):
         raise RuntimeError("boom")
 
     monkeypatch.setattr(jm.service, "generate_pdf", fake_generate_pdf)
 
-    jm.start_workers()
-
-    req = LabelRequest(template_name="demo.glabels", data=[{"A": 1}], copies=1)
-    job_id = await jm.submit_job(req)
+    job_id = await jm.submit_job(demo_req)
 
-    await asyncio.wait_for(jm.queue.join(), timeout=1)
+    await asyncio.wait_for(jm._done[job_id], timeout=1)
 
     job = jm.get_job(job_id)
     assert job["status"] == "failed"
     assert "boom" in job["error"]
 
-    await jm.stop_workers()
 
-
-@pytest.mark.asyncio
-async def test_jobs_total_multiple(monkeypatch):
+@pytest.mark.asyncio(loop_scope="module")
+async def test_jobs_total_multiple(jm, demo_req, monkeypatch):
     """jobs_total should increase as multiple jobs are submitted"""
-
-    jm = JobManager()
+    before = jm.jobs_total
 
     # Always succeed
     async def fake_generate_pdf(*a, **k):
@@ -90,117 +109,233 @@ async def test_jobs_total_multiple(monkeypatch):
 
     monkeypatch.setattr(jm.service, "generate_pdf", fake_generate_pdf)
 
-    jm.start_workers()
+    ids = [await jm.submit_job(demo_req) for _ in range(3)]
 
-    req = LabelRequest(template_name="demo.glabels", data=[{"x": 1}], copies=1)
-    ids = [await jm.submit_job(req) for _ in range(3)]
-
-    await asyncio.wait_for(jm.queue.join(), timeout=1)
+    await asyncio.wait_for(asyncio.wait([jm._done[j] for j in ids]), timeout=1)
 
     # Ensure all jobs done
     for jid in ids:
         assert jm.get_job(jid)["status"] == "done"
 
-    assert jm.jobs_total == 3
+    assert jm.jobs_total - before == 3
 
-    await jm.stop_workers()
+
+@pytest.mark.asyncio(loop_scope="module")
+async def test_wait_job_returns_when_job_finishes(jm, demo_req, monkeypatch):
+    """wait_job should time out while running and return once the job ends"""
+    release = asyncio.Event()
+
+    async def fake_generate_pdf(*a, **k):
+        await release.wait()
+
+    monkeypatch.setattr(jm.service, "generate_pdf", fake_generate_pdf)
+
+    job_id = await jm.submit_job(demo_req)
+    assert await jm.wait_job(job_id, timeout=0.05) is False
+    assert not jm._done[job_id].cancelled()
+
+    release.set()
+    assert await jm.wait_job(job_id, timeout=1) is True
+    assert jm.get_job(job_id)["status"] == "done"
+    assert await jm.wait_job("missing", timeout=1) is True
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("future", ["missing", "resolved"])
+async def test_wait_job_sleeps_for_unfinished_job_without_pending_future(future):
+    """wait_job must not return early for a non-terminal job (no busy-spin)"""
+    jm = JobManager()
+    now = datetime.now(timezone.utc)
+    jm.jobs["running"] = JobRecord(
+        status="running",
+        filename="running.pdf",
+        template="demo.glabels",
+        created_at=now,
+        started_at=now,
+        request={},
+    )
+    if future == "resolved":
+        # Resolved outside the worker while the record is still running
+        jm._done["running"] = asyncio.get_running_loop().create_future()
+        jm._done["running"].set_result(None)
+
+    start = time.monotonic()
+    assert await jm.wait_job("running", timeout=0.05) is False
+    assert time.monotonic() - start >= 0.04
+
+
+@pytest.mark.asyncio
+async def test_submit_job_waits_when_queue_full(demo_req, monkeypatch):
+    """submit_job should wait for queue space when MAX_QUEUE_SIZE is reached"""
+    monkeypatch.setattr("app.services.job_manager.settings.MAX_QUEUE_SIZE", 1)
+    jm = JobManager()
+
+    await jm.submit_job(demo_req)
+
+    blocked = asyncio.create_task(jm.submit_job(demo_req))
+    await asyncio.sleep(0.05)
+    assert not blocked.done()
+    assert jm.jobs_total == 1
+
+    # Free one slot (as a worker would); the blocked submission completes
+    jm.queue.get_nowait()
+    jm.queue.task_done()
+    job_id = await asyncio.wait_for(blocked, timeout=1)
+    assert job_id in jm.jobs
+    assert jm.jobs_total == 2
 
 
-def test_cleanup_jobs():
+def test_cleanup_jobs(demo_req):
     """Expired jobs should be removed from JobManager"""
 
     jm = JobManager()
     jm.retention = timedelta(seconds=0)  # expire immediately
 
-    req = LabelRequest(template_name="demo.glabels", data=[{"A": 1}], copies=1)
+    an_hour_ago = datetime.now(timezone.utc) - timedelta(hours=1)
     job_id = "jid"
-    jm.jobs[job_id] = {
-        "status": "done",
-        "filename": "out.pdf",
-        "template": "demo.glabels",
-        "error": None,
-        "created_at": datetime.now(timezone.utc) - timedelta(hours=1),
-        "started_at": datetime.now(timezone.utc) - timedelta(hours=1),
-        "finished_at": datetime.now(timezone.utc) - timedelta(hours=1),
-        "request": req.model_dump(),
-    }
+    jm.jobs[job_id] = JobRecord(
+        status="done",
+        filename="out.pdf",
+        template="demo.glabels",
+        error=None,
+        created_at=an_hour_ago,
+        started_at=an_hour_ago,
+        finished_at=an_hour_ago,
+        request=demo_req.model_dump(),
+    )
+    heapq.heappush(jm._expiry_heap, (time.monotonic() - 3600, job_id))
 
     jm._cleanup_jobs()
     assert job_id not in jm.jobs
+    assert not jm._expiry_heap
 
 
-def test_cleanup_jobs_skips_unfinished():
+def test_cleanup_jobs_skips_unfinished(demo_req):
     """Unfinished jobs should not be removed by cleanup."""
     jm = JobManager()
     jm.retention = timedelta(seconds=0)
 
-    req = LabelRequest(template_name="demo.glabels", data=[{"A": 1}], copies=1)
+    an_hour_ago = datetime.now(timezone.utc) - timedelta(hours=1)
     job_id = "running"
-    jm.jobs[job_id] = {
-        "status": "running",
-        "filename": "out.pdf",
-        "template": "demo.glabels",
-        "error": None,
-        "created_at": datetime.now(timezone.utc) - timedelta(hours=1),
-        "started_at": datetime.now(timezone.utc) - timedelta(hours=1),
-        "finished_at": None,
-        "request": req.model_dump(),
-    }
+    jm.jobs[job_id] = JobRecord(
+        status="running",
+        filename="out.pdf",
+        template="demo.glabels",
+        error=None,
+        created_at=an_hour_ago,
+        started_at=an_hour_ago,
+        finished_at=None,
+        request=demo_req.model_dump(),
+    )
 
     jm._cleanup_jobs()
     assert job_id in jm.jobs
 
 
-def test_get_job_and_list_jobs():
-    """list_jobs should return jobs sorted by created_at, get_job returns correct job"""
+def test_evict_overflow_keeps_unfinished(monkeypatch, tmp_path):
+    """Exceeding MAX_JOBS_IN_MEMORY should evict the oldest finished jobs only"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("app.services.job_manager.settings.MAX_JOBS_IN_MEMORY", 2)
+    jm = JobManager()
 
+    now = datetime.now(timezone.utc)
+    for jid, finished_at in (("running", None), ("old", now), ("new", now)):
+        jm.jobs[jid] = JobRecord(
+            status="running" if finished_at is None else "done",
+            filename=f"{jid}.pdf",
+            template="demo.glabels",
+            error=None,
+            created_at=now,
+            started_at=now,
+            finished_at=finished_at,
+            request={},
+        )
+
+    jm._evict_overflow()
+    assert list(jm.jobs) == ["running", "new"]
+
+
+def test_evict_overflow_bounds_expiry_heap(monkeypatch, tmp_path):
+    """Evicted jobs should not pile up on the expiry heap"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("app.services.job_manager.settings.MAX_JOBS_IN_MEMORY", 100)
     jm = JobManager()
 
     now = datetime.now(timezone.utc)
-    req = LabelRequest(template_name="demo.glabels", data=[{"A": 1}], copies=1)
-
-    # Insert 3 jobs with different timestamps
-    jm.jobs["jid1"] = {
-        "status": "done",
-        "filename": "a.pdf",
-        "template": "demo",
-        "error": None,
-        "created_at": now - timedelta(seconds=5),
-        "started_at": now - timedelta(seconds=4),
-        "finished_at": now,
-        "request": req.model_dump(),
-    }
-    jm.jobs["jid2"] = {
-        "status": "pending",
-        "filename": None,
-        "template": "demo",
-        "error": None,
-        "created_at": now - timedelta(seconds=1),
-        "started_at": None,
-        "finished_at": None,
-        "request": req.model_dump(),
-    }
-    jm.jobs["jid3"] = {
-        "status": "running",
-        "filename": None,
-        "template": "demo",
-        "error": None,
-        "created_at": now - timedelta(seconds=3),
-        "started_at": now - timedelta(seconds=2),
-        "finished_at": None,
-        "request": req.model_dump(),
-    }
-
-    # list_jobs should be sorted (latest first)
+    for i in range(5000):
+        jid = f"jid{i}"
+        jm.jobs[jid] = JobRecord(
+            status="done",
+            filename=f"{jid}.pdf",
+            template="demo.glabels",
+            created_at=now,
+            started_at=now,
+            finished_at=now,
+            request={},
+        )
+        heapq.heappush(jm._expiry_heap, (time.monotonic(), jid))
+        jm._evict_overflow()
+
+    assert len(jm.jobs) == 100
+    assert len(jm._expiry_heap) <= 2 * len(jm.jobs)
+    assert {jid for _, jid in jm._expiry_heap} >= set(jm.jobs)
+
+
+def test_get_job_and_list_jobs(demo_req):
+    """list_jobs should return the newest jobs first, get_job returns correct job"""
+
+    jm = JobManager()
+
+    now = datetime.now(timezone.utc)
+    payload = demo_req.model_dump()
+
+    # Insert 3 jobs in submission order (oldest first, as submit_job does)
+    jm.jobs["jid1"] = JobRecord(
+        status="done",
+        filename="a.pdf",
+        template="demo",
+        error=None,
+        created_at=now - timedelta(seconds=5),
+        started_at=now - timedelta(seconds=4),
+        finished_at=now,
+        request=payload,
+    )
+    jm.jobs["jid3"] = JobRecord(
+        status="running",
+        filename="c.pdf",
+        template="demo",
+        error=None,
+        created_at=now - timedelta(seconds=3),
+        started_at=now - timedelta(seconds=2),
+        finished_at=None,
+        request=payload,
+    )
+    jm.jobs["jid2"] = JobRecord(
+        status="pending",
+        filename="b.pdf",
+        template="demo",
+        error=None,
+        created_at=now - timedelta(seconds=1),
+        started_at=None,
+        finished_at=None,
+        request=payload,
+    )
+
+    # list_jobs should return the newest first
     jobs = jm.list_jobs(limit=2)
     assert len(jobs) == 2
     assert jobs[0]["job_id"] == "jid2"
     assert jobs[1]["job_id"] == "jid3"
 
-    # get_job should return correct record
+    # get_job should return correct record, as a read-only view
     job = jm.get_job("jid1")
     assert job is not None
     assert job["filename"] == "a.pdf"
+    with pytest.raises(TypeError):
+        job["status"] = "failed"
+    jm.jobs["jid1"].status = "failed"
+    assert job["status"] == "failed"
+    assert dict(job) == jm.jobs["jid1"].to_dict()
 
     # get_job for missing id returns None
     assert jm.get_job("missing") is None
@@ -230,14 +365,189 @@ def test_cleanup_old_pdfs(monkeypatch, tmp_path):
     assert new_pdf.exists()
 
 
+@pytest.mark.asyncio
+async def test_cleanup_timer_expires_finished_job(demo_req, monkeypatch, tmp_path):
+    """The expiry timer should be armed for the next expiry, not polled"""
+    jm = JobManager()
+    monkeypatch.chdir(tmp_path)
+
+    async def fake_generate_pdf(*a, **k):
+        return "dummy.pdf"
+
+    monkeypatch.setattr(jm.service, "generate_pdf", fake_generate_pdf)
+
+    jm.start_workers()
+    # Nothing to expire yet: only the periodic output/ sweep is armed
+    assert jm._expiry_handle is None
+    assert jm._sweep_handle is not None
+
+    jm.retention = timedelta(milliseconds=50)
+    job_id = await jm.submit_job(demo_req)
+    await asyncio.wait_for(jm._done[job_id], timeout=1)
+
+    # Finishing the job arms the timer for its expiry
+    assert jm._expiry_due < time.monotonic() + 1
+    await asyncio.sleep(0.2)
+    assert jm.get_job(job_id) is None
+    assert jm._expiry_heap == []
+
+    await jm.stop_workers()
+
+
+@pytest.mark.asyncio
+async def test_expiry_timer_does_not_sweep_output(demo_req, monkeypatch, tmp_path):
+    """Expiring job records should not rescan output/ once per job"""
+    jm = JobManager()
+    monkeypatch.chdir(tmp_path)
+
+    sweeps = []
+    monkeypatch.setattr(jm, "_sweep_output", lambda: sweeps.append(1))
+
+    async def fake_generate_pdf(*a, **k):
+        return "dummy.pdf"
+
+    monkeypatch.setattr(jm.service, "generate_pdf", fake_generate_pdf)
+
+    jm.start_workers()
+    assert len(sweeps) == 1  # startup cleanup
+
+    jm.retention = timedelta(milliseconds=20)
+    ids = []
+    for _ in range(20):  # staggered: each job expires at its own time
+        job_id = await jm.submit_job(demo_req)
+        await asyncio.wait_for(jm._done[job_id], timeout=1)
+        ids.append(job_id)
+        await asyncio.sleep(0.005)
+
+    await asyncio.sleep(0.1)
+    assert all(jm.get_job(jid) is None for jid in ids)
+    assert len(sweeps) == 1  # the sweep stays on its cleanup_interval cadence
+
+    await jm.stop_workers()
+
+
+@pytest.mark.asyncio
+async def test_supervisor_restarts_crashed_pool(demo_req, monkeypatch):
+    """A crashing worker should not leave the manager without workers"""
+    jm = JobManager()
+    jm.restart_delay = 0
+    real_worker = jm._worker
+    crashes = []
+
+    async def flaky_worker(wid):
+        if not crashes:
+            crashes.append(wid)
+            raise RuntimeError("worker bug")
+        await real_worker(wid)
+
+    async def fake_generate_pdf(*a, **k):
+        return "dummy.pdf"
+
+    monkeypatch.setattr(jm, "_worker", flaky_worker)
+    monkeypatch.setattr(jm.service, "generate_pdf", fake_generate_pdf)
+
+    jm.start_workers()
+    job_id = await jm.submit_job(demo_req)
+    await asyncio.wait_for(jm._done[job_id], timeout=1)
+
+    assert crashes == [0]
+    assert jm.get_job(job_id)["status"] == "done"
+    assert not jm.supervisor_task.done()
+    assert len(jm.workers) == jm.max_parallel
+
+    await jm.stop_workers()
+
+
+@pytest.mark.asyncio
+async def test_job_bookkeeping_error_spares_sibling_jobs(demo_req, monkeypatch):
+    """A per-job error should fail that job only, not restart the pool"""
+    jm = JobManager()
+    jm.max_parallel = 3
+    release = asyncio.Event()
+    calls = []
+
+    async def fake_generate_pdf(*a, **k):
+        calls.append(k["job_id"])
+        if len(calls) <= 2:
+            await release.wait()
+        return "dummy.pdf"
+
+    monkeypatch.setattr(jm.service, "generate_pdf", fake_generate_pdf)
+
+    jm.start_workers()
+    slow = [await jm.submit_job(demo_req) for _ in range(2)]
+
+    async def slow_started():
+        while len(calls) < 2 or len(jm.workers) < jm.max_parallel:
+            await asyncio.sleep(0)
+
+    await asyncio.wait_for(slow_started(), timeout=1)
+    workers = list(jm.workers)
+    real_schedule_expiry = jm._schedule_expiry
+
+    def broken_schedule_expiry():
+        monkeypatch.setattr(jm, "_schedule_expiry", real_schedule_expiry)
+        raise RuntimeError("bookkeeping bug")
+
+    monkeypatch.setattr(jm, "_schedule_expiry", broken_schedule_expiry)
+    fast = await jm.submit_job(demo_req)
+    await asyncio.wait_for(jm._done[fast], timeout=1)
+
+    assert jm.get_job(fast)["status"] == "done"
+    assert [jm.get_job(j)["status"] for j in slow] == ["running", "running"]
+    assert jm.workers == workers
+
+    release.set()
+    await asyncio.wait_for(asyncio.gather(*(jm._done[j] for j in slow)), timeout=1)
+    assert [jm.get_job(j)["status"] for j in slow] == ["done", "done"]
+
+    await jm.stop_workers()
+
+
+@pytest.mark.asyncio
+async def test_stop_workers_fails_in_flight_job(demo_req, monkeypatch):
+    """A job cancelled mid-run should end as failed, not stay running"""
+    jm = JobManager()
+    started = asyncio.Event()
+
+    async def fake_generate_pdf(*a, **k):
+        started.set()
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(jm.service, "generate_pdf", fake_generate_pdf)
+
+    jm.start_workers()
+    job_id = await jm.submit_job(demo_req)
+    await asyncio.wait_for(started.wait(), timeout=1)
+    await jm.stop_workers()
+
+    job = jm.get_job(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "worker cancelled"
+    assert job["finished_at"] is not None
+
+
 @pytest.mark.asyncio
 async def test_start_stop_workers():
     """Workers should start and stop cleanly"""
     jm = JobManager()
     jm.start_workers()
+
+    async def pool_started():
+        while len(jm.workers) < jm.max_parallel:
+            await asyncio.sleep(0)
+
+    # let the supervisor spawn the pool's TaskGroup workers
+    await asyncio.wait_for(pool_started(), timeout=1)
     assert len(jm.workers) == jm.max_parallel
     for worker in jm.workers:
         assert not worker.done()
 
+    assert jm._sweep_handle is not None
+
+    workers = list(jm.workers)
     await jm.stop_workers()
     assert len(jm.workers) == 0
+    assert jm._expiry_handle is None
+    assert jm._sweep_handle is None
+    assert all(worker.cancelled() for worker in workers)
@@ -11,6 +11,7 @@ Covers:
 """
 
 import csv
+import os
 import tempfile
 from pathlib import Path
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -66,6 +67,13 @@ class TestUtilityFunctions:
         result = _collect_fieldnames(data)
         assert result == ["A", "B", "C"]
 
+    def test_collect_fieldnames_uniform_rows(self):
+        """Rows with identical key sets should keep the first row's order"""
+        data = [{"A": 1, "B": 2}, {"B": 3, "A": 4}]
+        assert _collect_fieldnames(data) == ["A", "B"]
+        assert _collect_fieldnames(data, exclude=["A"]) == ["B"]
+        assert _collect_fieldnames([]) == []
+
     def test_collect_fieldnames_with_exclude(self):
         """Should exclude specified fields"""
         data = [{"A": 1, "B": 2, "C": 3}]
@@ -80,6 +88,9 @@ class TestUtilityFunctions:
         # Special characters get replaced with underscores
         assert _slug("test@#$%") == "test____"
         assert _slug("file<>name") == "file__name"
+        # Non-ASCII characters are replaced as well
+        assert _slug("標籤-é") == "__-_"
+        assert _slug("") == ""
 
 
 class TestMergePdfs:
@@ -364,3 +375,66 @@ class TestJsonToCsv:
         with csv_path.open("r", encoding="utf-8") as f:
             header = f.readline().strip()
         assert header == "A,B,C"
+
+    def test_json_to_csv_fast_path_matches_csv_writer(self, tmp_path):
+        """Plain values should produce the same bytes as csv.writer"""
+        service = LabelPrintService(max_parallel=1, default_timeout=10, keep_csv=False)
+        csv_path = tmp_path / "out.csv"
+        data = [{"ITEM": "A001", "QTY": 2, "NOTE": None}, {"ITEM": "A002"}]
+
+        service._json_to_csv(data, csv_path)
+
+        assert csv_path.read_bytes() == b"ITEM,QTY,NOTE\r\nA001,2,\r\nA002,,\r\n"
+
+    def test_json_to_csv_quotes_special_values(self, tmp_path):
+        """Values with commas, quotes or newlines should round-trip via csv"""
+        service = LabelPrintService(max_parallel=1, default_timeout=10, keep_csv=False)
+        csv_path = tmp_path / "out.csv"
+        data = [
+            {"ITEM": "A,001", "CODE": 'say "hi"'},
+            {"ITEM": "line1\nline2", "CODE": "X124"},
+        ]
+
+        service._json_to_csv(data, csv_path)
+
+        with csv_path.open("r", newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        assert rows == data
+
+
+class TestResolveTemplate:
+    """Tests for template lookup"""
+
+    def test_resolve_template_case_insensitive_and_refresh(self, tmp_path, monkeypatch):
+        """Should match names case-insensitively and pick up new templates"""
+        monkeypatch.chdir(tmp_path)
+        templates_dir = tmp_path / "templates"
+        templates_dir.mkdir()
+        (templates_dir / "Demo.glabels").touch()
+        service = LabelPrintService(max_parallel=1, default_timeout=10, keep_csv=False)
+
+        assert service._resolve_template("demo.glabels").name == "Demo.glabels"
+        with pytest.raises(FileNotFoundError):
+            service._resolve_template("new.glabels")
+
+        # Adding a file changes the directory mtime and invalidates the cache
+        (templates_dir / "new.glabels").touch()
+        assert service._resolve_template("new.glabels").name == "new.glabels"
+
+    def test_resolve_template_rescans_on_miss(self, tmp_path, monkeypatch):
+        """A new template should be found even if the directory mtime stays the same"""
+        monkeypatch.chdir(tmp_path)
+        templates_dir = tmp_path / "templates"
+        templates_dir.mkdir()
+        (templates_dir / "demo.glabels").touch()
+        service = LabelPrintService(max_parallel=1, default_timeout=10, keep_csv=False)
+        assert service._resolve_template("demo.glabels").name == "demo.glabels"
+
+        # Simulate a mount that does not pass the mtime change through
+        st = templates_dir.stat()
+        (templates_dir / "added.glabels").touch()
+        os.utime(templates_dir, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+        assert service._resolve_template("added.glabels").name == "added.glabels"
+        with pytest.raises(FileNotFoundError):
+            service._resolve_template("missing.glabels")